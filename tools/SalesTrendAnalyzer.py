@@ -16,21 +16,37 @@ sys.path.append(str(project_root))
 import logging
 import pandas as pd
 import numpy as np
-from typing import Dict, Any, Optional, List, Union, Tuple
+from typing import Dict, Any, Optional, List, Union, Tuple, TYPE_CHECKING
 from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
 import io
 import base64
 import sqlite3
+import atexit
+import threading
+import weakref
+import functools
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 
 from database.connection import get_connection
 from database.query_templates import get_date_range
-import config
 
-# Configure logging
-logging.basicConfig(level=config.LOGGING['level'])
+if TYPE_CHECKING:
+    # matplotlib is imported lazily, on the first visualization
+    from matplotlib.figure import Figure
+
+# Logging is configured by the host application
 logger = logging.getLogger(__name__)
 
+# Analyzers holding cached connections, closed when the interpreter exits
+_open_analyzers = weakref.WeakSet()
+
+@atexit.register
+def _close_open_analyzers() -> None:
+    """Close the cached connections of all live analyzers."""
+    for analyzer in list(_open_analyzers):
+        analyzer.close()
+
 class SalesTrendAnalyzer:
     """
     Analyzes sales trends over time, identifying patterns, seasonality, and growth rates.
@@ -40,12 +56,69 @@ class SalesTrendAnalyzer:
     VALID_METRICS = ['revenue', 'units', 'aov', 'margin']
     VALID_DIMENSIONS = ['product', 'category', 'channel', 'region', 'customer', None]
     
+    # SQL expression grouping transactions into sortable integer period keys:
+    # YYYYMMDD (daily), YYYYWW (weekly), YYYYMM (monthly), YYYYQ (quarterly), YYYY (annual)
+    TIME_GROUP_SQL = {
+        'daily': "CAST(strftime('%Y%m%d', \"Txn Date\") AS INTEGER)",
+        'weekly': "CAST(strftime('%Y%W', \"Txn Date\") AS INTEGER)",
+        'monthly': "CAST(strftime('%Y%m', \"Txn Date\") AS INTEGER)",
+        'quarterly': "(CAST(strftime('%Y', \"Txn Date\") AS INTEGER) * 10 + (CAST(strftime('%m', \"Txn Date\") AS INTEGER) + 2) / 3)",
+        'annual': "CAST(strftime('%Y', \"Txn Date\") AS INTEGER)"
+    }
+    
+    # NumPy dtypes for the numeric columns of the trend query; others stay as objects
+    COLUMN_DTYPES = {
+        'period': np.int64,
+        'revenue': np.float64,
+        'units': np.float64,
+        'orders': np.int64
+    }
+    
+    # Length of one seasonal cycle, in periods; annual data has no cycle to extract
+    SEASONAL_CYCLES = {
+        'daily': 7,
+        'weekly': 52,
+        'monthly': 12,
+        'quarterly': 4,
+        'annual': None
+    }
+    
+    # Power a seasonal harmonic needs, relative to the median periodogram, to count as seasonal
+    SEASONAL_POWER_RATIO = 8.0
+    
+    # Integer trend query columns narrowed to int32 after fetching
+    DOWNCAST_COLUMNS = ('period', 'orders')
+    
+    # Applied to every new connection: WAL journaling plus larger page cache and memory map
+    CONNECTION_PRAGMAS = [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA mmap_size=268435456",
+        "PRAGMA cache_size=-65536",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA case_sensitive_like=OFF"
+    ]
+    
+    # (id, name) columns of each dimension
+    DIMENSION_FIELDS = {
+        'product': ('Item Key', 'Item Number'),
+        'category': ('Item Category Hrchy Key', 'Product Posting Group'),
+        'channel': ('Sales Organization Key', 'Business Unit Key'),
+        'region': ('Customer Geography Hrchy Key', 'Customer Geography Hrchy Key'),
+        'customer': ('Customer Key', 'Customer Key')
+    }
+    
+    # Metrics dimension members can be ranked by for top performers
+    RANKED_METRICS = ('revenue', 'units')
+    
     def __init__(self, time_period: str = 'monthly', metric: str = "revenue", 
                  dimension: Optional[str] = None, top_n: int = 5,
                  filters: Optional[Dict[str, Any]] = None,
                  include_visualization: bool = True,
                  trend_periods: int = 12,
-                 db_path: str = None):
+                 db_path: str = None,
+                 cache_dir: Optional[str] = None,
+                 max_workers: Optional[int] = 1):
         """
         Initialize the SalesTrendAnalyzer.
         
@@ -58,6 +131,10 @@ class SalesTrendAnalyzer:
             include_visualization: Whether to include trend visualization
             trend_periods: Number of periods to include in the trend analysis
             db_path: Path to the SQLite database file
+            cache_dir: Optional directory for caching trend query results as Parquet files.
+                Entries are never invalidated, so only use it for data that is append-only
+            max_workers: Number of threads querying disjoint date sub-ranges concurrently,
+                None to use one per CPU. 1 queries the whole range on a single connection
         """
         if time_period not in self.VALID_TIME_PERIODS:
             raise ValueError(f"Invalid time period. Must be one of {self.VALID_TIME_PERIODS}")
@@ -65,6 +142,8 @@ class SalesTrendAnalyzer:
             raise ValueError(f"Invalid metric. Must be one of {self.VALID_METRICS}")
         if dimension not in self.VALID_DIMENSIONS:
             raise ValueError(f"Invalid dimension. Must be one of {self.VALID_DIMENSIONS}")
+        if max_workers is not None and max_workers < 1:
+            raise ValueError("Invalid max_workers. Must be at least 1")
             
         self.time_period = time_period
         self.metric = metric.lower()
@@ -74,19 +153,101 @@ class SalesTrendAnalyzer:
         self.include_visualization = include_visualization
         self.trend_periods = trend_periods
         self.db_path = db_path or r"C:\Code\PythonProject\MultiagentML\multiagent-googleADK\orchestration_agent\database\sales_agent.db"
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._index_checked = False
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._date_range = None
+        self._figure = None
+        self._axes = None
+        self._figure_lock = threading.Lock()
+        self._executor = None
         
-        logger.info(f"Initialized SalesTrendAnalyzer with time_period={time_period}, metric={metric}, dimension={dimension}, trend_periods={trend_periods}")
+        logger.info("Initialized SalesTrendAnalyzer with time_period=%s, metric=%s, dimension=%s, trend_periods=%d",
+                    time_period, metric, dimension, trend_periods)
     
     def _get_connection(self):
-        """Get database connection."""
+        """
+        Get database connection.
+        
+        Connections are opened lazily, one per thread, and reused for the
+        lifetime of the analyzer. Call close() to release them early.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+        
         try:
-            return sqlite3.connect(self.db_path)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            for pragma in self.CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            
+            if not self._index_checked:
+                self._ensure_indexes(conn)
+                self._index_checked = True
+            
+            # The analyzer never writes, so lock the connection to reads
+            conn.execute("PRAGMA query_only=ON")
+            
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+            _open_analyzers.add(self)
+            
+            return conn
         except Exception as e:
-            logger.error(f"Error connecting to database: {str(e)}")
+            logger.error("Error connecting to database: %s", e)
             raise
     
+    def close(self) -> None:
+        """Close all database connections and worker threads opened by this analyzer."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+            self._local = threading.local()
+        
+        for conn in connections:
+            conn.close()
+        _open_analyzers.discard(self)
+    
+    def _ensure_indexes(self, conn: sqlite3.Connection) -> None:
+        """
+        Create the index supporting the date range scans, if missing.
+        
+        SQLite has no INCLUDE clause, so the measure columns are appended to
+        the key to make the index covering for the ungrouped trend query.
+        
+        Args:
+            conn: Open database connection
+        """
+        try:
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS ix_sales_txn_date
+                ON "dbo_F_Sales_Transaction" (
+                    "Txn Date", "Deleted Flag", "Excluded Flag",
+                    "Net Sales Amount", "Net Sales Quantity", "Sales Txn Number"
+                )
+            """)
+            conn.commit()
+        except sqlite3.OperationalError as e:
+            # Read-only databases still work, just without the index
+            logger.warning("Could not create sales date index: %s", e)
+    
     def get_available_date_range(self) -> Dict[str, str]:
-        """Get the available date range in the database."""
+        """
+        Get the available date range in the database.
+        
+        A successful lookup is cached on the analyzer, so repeated calls
+        to analyze_trends do not rescan the transaction table.
+        """
+        if self._date_range is not None:
+            return dict(self._date_range)
+        
         try:
             conn = self._get_connection()
             
@@ -96,23 +257,23 @@ class SalesTrendAnalyzer:
                 WHERE "Deleted Flag" = 0 AND "Excluded Flag" = 0
             """
             
-            date_range = pd.read_sql_query(query, conn)
-            conn.close()
+            min_date, max_date = conn.execute(query).fetchone()
             
-            if date_range.empty:
+            if min_date is None:
                 return {
                     "status": "error",
                     "message": "No data available in the database"
                 }
             
-            return {
+            self._date_range = {
                 "status": "success",
-                "min_date": date_range['min_date'].iloc[0],
-                "max_date": date_range['max_date'].iloc[0]
+                "min_date": min_date,
+                "max_date": max_date
             }
+            return dict(self._date_range)
             
         except Exception as e:
-            logger.error(f"Error getting date range: {str(e)}")
+            logger.error("Error getting date range: %s", e)
             return {
                 "status": "error",
                 "message": str(e)
@@ -120,40 +281,77 @@ class SalesTrendAnalyzer:
     
     def _get_time_grouping(self) -> str:
         """Get the SQL time grouping based on the time period."""
-        if self.time_period == 'daily':
-            return 'date("Txn Date")'
-        elif self.time_period == 'weekly':
-            return "strftime('%Y-%W', \"Txn Date\")"
-        elif self.time_period == 'monthly':
-            return "strftime('%Y-%m', \"Txn Date\")"
-        elif self.time_period == 'quarterly':
-            return "strftime('%Y-Q' || CAST((CAST(strftime('%m', \"Txn Date\") AS INTEGER) + 2) / 3 AS TEXT), \"Txn Date\")"
-        else:  # annual
-            return "strftime('%Y', \"Txn Date\")"
-    
-    def _build_query(self, start_date: str, end_date: str) -> str:
+        return self.TIME_GROUP_SQL[self.time_period]
+    
+    def _get_filter_shape(self) -> Tuple[Tuple[str, Optional[int]], ...]:
+        """
+        Get the shape of the configured filters.
+        
+        The shape lists each filtered field with the length of its value list,
+        or None for a scalar value. It fully determines the filter SQL, so it
+        is used as the cache key for the compiled query templates.
+        """
+        return tuple(
+            (field, len(value) if isinstance(value, (list, tuple)) else None)
+            for field, value in self.filters.items()
+        )
+    
+    @staticmethod
+    def _build_filter_clause(filter_shape: Tuple[Tuple[str, Optional[int]], ...]) -> str:
+        """Build the WHERE conditions for a filter shape."""
+        clause = ""
+        for field, size in filter_shape:
+            if size is not None:
+                placeholders = ','.join(['?' for _ in range(size)])
+                clause += f' AND "{field}" IN ({placeholders})'
+            else:
+                clause += f' AND "{field}" = ?'
+        return clause
+    
+    def _build_params(self, start_date: str, end_date: str) -> List[Any]:
+        """Build the query parameters matching the date range and filter placeholders."""
+        params = [start_date, end_date]
+        for value in self.filters.values():
+            if isinstance(value, (list, tuple)):
+                params.extend(value)
+            else:
+                params.append(value)
+        return params
+    
+    def _build_query(self, half_open: bool = False) -> str:
         """
         Build SQL query for trend analysis.
         
+        Dates and filter values are bound as parameters (see _build_params), so
+        the SQL text only depends on the analyzer settings and is served from a
+        template cache. Identical text also lets sqlite3 reuse its prepared statement.
+        
         Args:
-            start_date: Start date for analysis (YYYY-MM-DD)
-            end_date: End date for analysis (YYYY-MM-DD)
+            half_open: Exclude the end date from the range, for splitting it into sub-ranges
             
         Returns:
             SQL query string
         """
-        time_group = self._get_time_grouping()
+        return self._compile_query(self._get_time_grouping(), self.dimension, self._get_filter_shape(), half_open)
+    
+    @classmethod
+    @functools.lru_cache(maxsize=128)
+    def _compile_query(cls, time_group: str, dimension: Optional[str],
+                       filter_shape: Tuple[Tuple[str, Optional[int]], ...],
+                       half_open: bool = False) -> str:
+        """
+        Compile the trend query template for a grouping, dimension and filter shape.
         
-        # Base query with dimension fields
-        dimension_field = None
-        if self.dimension:
-            dimension_field = {
-                'product': ('Item Key', 'Item Number'),
-                'category': ('Item Category Hrchy Key', 'Product Posting Group'),
-                'channel': ('Sales Organization Key', 'Business Unit Key'),
-                'region': ('Customer Geography Hrchy Key', 'Customer Geography Hrchy Key'),
-                'customer': ('Customer Key', 'Customer Key')
-            }.get(self.dimension)
+        Args:
+            time_group: SQL expression grouping transactions into periods
+            dimension: Dimension to break down trends by, if any
+            filter_shape: Filter shape as returned by _get_filter_shape
+            half_open: Exclude the end date from the range
+            
+        Returns:
+            SQL query string
+        """
+        dimension_field = cls.DIMENSION_FIELDS.get(dimension)
         
         # Build SELECT clause
         select_clause = [
@@ -166,32 +364,29 @@ class SalesTrendAnalyzer:
         if dimension_field:
             select_clause.extend([
                 f'"{dimension_field[0]}" as dimension_id',
-                f'"{dimension_field[1]}" as dimension_name'
+                f'MAX("{dimension_field[1]}") as dimension_name'
             ])
         
+        date_condition = '"Txn Date" >= ? AND "Txn Date" < ?' if half_open else '"Txn Date" BETWEEN ? AND ?'
+        
         query = f"""
             SELECT {', '.join(select_clause)}
             FROM "dbo_F_Sales_Transaction"
-            WHERE "Txn Date" BETWEEN ? AND ?
+            WHERE {date_condition}
                 AND "Deleted Flag" = 0
                 AND "Excluded Flag" = 0
         """
         
         # Add filters if specified
-        if self.filters:
-            for field, value in self.filters.items():
-                if isinstance(value, (list, tuple)):
-                    placeholders = ','.join(['?' for _ in value])
-                    query += f' AND "{field}" IN ({placeholders})'
-                else:
-                    query += f' AND "{field}" = ?'
+        query += cls._build_filter_clause(filter_shape)
         
         # Add GROUP BY and ORDER BY
         group_by = [time_group]
         order_by = [time_group]
         
         if dimension_field:
-            group_by.extend([f'"{dimension_field[0]}"', f'"{dimension_field[1]}"'])
+            # The name depends on the id, so grouping by the id alone is enough
+            group_by.append(f'"{dimension_field[0]}"')
             order_by.extend([f'"{dimension_field[0]}"'])
         
         query += f"""
@@ -201,6 +396,240 @@ class SalesTrendAnalyzer:
         
         return query
     
+    def _fetch_trend_data(self, start_date: Optional[str], end_date: Optional[str]) -> Dict[str, Any]:
+        """
+        Resolve the analysis date range and fetch the trend query result.
+        
+        Args:
+            start_date: Start date for analysis (YYYY-MM-DD), if None uses earliest available date
+            end_date: End date for analysis (YYYY-MM-DD), if None uses latest available date
+            
+        Returns:
+            Dictionary with the resolved 'start_date' and 'end_date' and the
+            fetched 'columns', or an error status and message
+        """
+        # Get date range if not specified
+        date_range = self.get_available_date_range()
+        if date_range["status"] == "error":
+            return {
+                "status": "error",
+                "message": date_range["message"]
+            }
+        
+        if not start_date:
+            start_date = date_range["min_date"]
+        if not end_date:
+            end_date = date_range["max_date"]
+        
+        # Reuse a cached result for the same range and settings if available
+        cache_path = self._get_cache_path(start_date, end_date)
+        columns = self._read_cached_columns(cache_path) if cache_path else None
+        
+        if columns is None:
+            columns = self._query_trend_columns(start_date, end_date)
+            
+            if columns and cache_path:
+                self._write_cached_columns(cache_path, columns)
+        
+        if not columns:
+            return {
+                "status": "error",
+                "message": "No data found for the specified period"
+            }
+        
+        return {
+            "status": "success",
+            "start_date": start_date,
+            "end_date": end_date,
+            "columns": self._downcast_columns(columns)
+        }
+    
+    def _downcast_columns(self, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Store integer trend columns as int32 when their values fit.
+        
+        Revenue and units stay float64: float32 keeps only about seven
+        significant digits, which would visibly round revenue totals.
+        
+        Args:
+            columns: Dictionary of NumPy arrays containing sales data
+            
+        Returns:
+            The same dictionary, with DOWNCAST_COLUMNS converted where possible
+        """
+        limits = np.iinfo(np.int32)
+        for name in self.DOWNCAST_COLUMNS:
+            values = columns.get(name)
+            if values is not None and limits.min <= values.min() and values.max() <= limits.max:
+                columns[name] = values.astype(np.int32)
+        return columns
+    
+    def _query_trend_columns(self, start_date: str, end_date: str) -> Dict[str, np.ndarray]:
+        """
+        Run the trend query, splitting the date range across worker threads.
+        
+        With max_workers above 1 the range is cut at period boundaries into
+        disjoint sub-ranges that are queried concurrently, each on the worker
+        thread's own read-only connection. Every period falls entirely within
+        one sub-range, so the partial results are simply concatenated and match
+        a single query over the whole range.
+        
+        Args:
+            start_date: Start date for analysis (YYYY-MM-DD)
+            end_date: End date for analysis (YYYY-MM-DD)
+            
+        Returns:
+            Dictionary mapping column names to arrays, empty if no rows matched
+        """
+        sub_ranges = self._split_date_range(start_date, end_date)
+        if len(sub_ranges) == 1:
+            return self._fetch_sub_range(start_date, end_date, False)
+        
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix="SalesTrendAnalyzer")
+        
+        parts = self._executor.map(lambda sub_range: self._fetch_sub_range(*sub_range), sub_ranges)
+        parts = [part for part in parts if part]
+        if not parts:
+            return {}
+        
+        # Parts are in date order and each is sorted by period, so the concatenation is too
+        return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    
+    def _split_date_range(self, start_date: str, end_date: str) -> List[Tuple[str, str, bool]]:
+        """
+        Split a date range into at most max_workers sub-ranges starting on period boundaries.
+        
+        Evenly spaced cut points are moved back to the start of their period,
+        and cut points that coincide are merged. Every sub-range but the last
+        excludes its end date, so together they cover exactly the rows of the
+        original inclusive range.
+        
+        Args:
+            start_date: Start date for analysis (YYYY-MM-DD)
+            end_date: End date for analysis (YYYY-MM-DD)
+            
+        Returns:
+            List of (start_date, end_date, half_open) tuples
+        """
+        try:
+            first_day = datetime.fromisoformat(str(start_date)[:10])
+            days = (datetime.fromisoformat(str(end_date)[:10]) - first_day).days
+        except ValueError:
+            return [(start_date, end_date, False)]
+        
+        chunks = min(self.max_workers, days)
+        if chunks <= 1:
+            return [(start_date, end_date, False)]
+        
+        cuts = sorted({
+            self._get_period_start(first_day + timedelta(days=round(i * days / chunks)))
+            for i in range(1, chunks)
+        })
+        bounds = [start_date] + [
+            cut.strftime('%Y-%m-%d') for cut in cuts if cut > first_day
+        ] + [end_date]
+        
+        return [
+            (bounds[i], bounds[i + 1], i < len(bounds) - 2)
+            for i in range(len(bounds) - 1)
+        ]
+    
+    def _get_period_start(self, day: datetime) -> datetime:
+        """
+        Get the first day of the period containing a day, as grouped by TIME_GROUP_SQL.
+        
+        Weeks follow strftime('%W'): they start on Monday, except that
+        the days before a year's first Monday form its week 00.
+        """
+        if self.time_period == 'weekly':
+            return max(day - timedelta(days=day.weekday()), day.replace(month=1, day=1))
+        if self.time_period == 'monthly':
+            return day.replace(day=1)
+        if self.time_period == 'quarterly':
+            return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+        if self.time_period == 'annual':
+            return day.replace(month=1, day=1)
+        return day
+    
+    def _fetch_sub_range(self, start_date: str, end_date: str, half_open: bool) -> Dict[str, np.ndarray]:
+        """Run the trend query for one date sub-range on the calling thread's connection."""
+        query = self._build_query(half_open)
+        params = self._build_params(start_date, end_date)
+        return self._fetch_columns(self._get_connection(), query, params)
+    
+    def _get_cache_path(self, start_date: str, end_date: str) -> Optional[Path]:
+        """
+        Get the Parquet cache file for a trend query, if caching is enabled.
+        
+        Args:
+            start_date: Start date for analysis (YYYY-MM-DD)
+            end_date: End date for analysis (YYYY-MM-DD)
+            
+        Returns:
+            Path of the cache file, or None when no cache directory is configured
+        """
+        if not self.cache_dir:
+            return None
+        
+        key = repr((
+            str(self.db_path), start_date, end_date, self.time_period,
+            self.dimension, sorted(self.filters.items())
+        ))
+        digest = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+        return self.cache_dir / f"{digest}.parquet"
+    
+    def _read_cached_columns(self, cache_path: Path) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Read cached trend query columns.
+        
+        Args:
+            cache_path: Path of the cache file
+            
+        Returns:
+            Dictionary mapping column names to arrays, or None on a cache miss
+        """
+        if not cache_path.exists():
+            return None
+        
+        try:
+            frame = pd.read_parquet(cache_path)
+            return {
+                name: frame[name].to_numpy(dtype=self.COLUMN_DTYPES.get(name, object))
+                for name in frame.columns
+            }
+        except Exception as e:
+            logger.warning("Error reading trend cache %s: %s", cache_path, e)
+            return None
+    
+    def _write_cached_columns(self, cache_path: Path, columns: Dict[str, np.ndarray]) -> None:
+        """
+        Write trend query columns to the cache.
+        
+        The file is written under a temporary name and then renamed, so
+        concurrent readers never see a partial file. Failures, such as a
+        missing Parquet engine, are logged and otherwise ignored.
+        
+        Results with NULL dimension keys are not cached: Parquet stores integer
+        ids mixed with NULLs as floats, so they would not read back unchanged.
+        
+        Args:
+            cache_path: Path of the cache file
+            columns: Dictionary of NumPy arrays to cache
+        """
+        if any(pd.isna(values).any() for values in columns.values() if values.dtype == object):
+            return
+        
+        temp_path = cache_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            pd.DataFrame(columns, copy=False).to_parquet(temp_path, compression='zstd', index=False)
+            os.replace(temp_path, cache_path)
+        except Exception as e:
+            logger.warning("Error writing trend cache %s: %s", cache_path, e)
+            temp_path.unlink(missing_ok=True)
+    
     def analyze_trends(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Dict[str, Any]:
         """
         Analyze sales trends for the specified time period.
@@ -213,55 +642,32 @@ class SalesTrendAnalyzer:
             Dictionary containing trend analysis results
         """
         try:
-            # Get date range if not specified
-            date_range = self.get_available_date_range()
-            if date_range["status"] == "error":
-                return {
-                    "status": "error",
-                    "message": date_range["message"]
-                }
-            
-            if not start_date:
-                start_date = date_range["min_date"]
-            if not end_date:
-                end_date = date_range["max_date"]
+            trend_data = self._fetch_trend_data(start_date, end_date)
+            if trend_data["status"] == "error":
+                return trend_data
             
-            # Build and execute query
-            query = self._build_query(start_date, end_date)
-            conn = self._get_connection()
-            
-            # Prepare query parameters
-            params = [start_date, end_date]
-            if self.filters:
-                for value in self.filters.values():
-                    if isinstance(value, (list, tuple)):
-                        params.extend(value)
-                    else:
-                        params.append(value)
-            
-            # Execute query
-            data = pd.read_sql_query(query, conn, params=params)
-            conn.close()
+            start_date = trend_data["start_date"]
+            end_date = trend_data["end_date"]
+            columns = trend_data["columns"]
             
-            if data.empty:
+            # Analyze all metrics in one pass and keep the requested one
+            analyses = self._analyze_all(columns)
+            if self.metric not in analyses:
                 return {
                     "status": "error",
-                    "message": "No data found for the specified period"
+                    "message": "Margin analysis requires cost data, which is not available"
                 }
             
-            # Analyze trends based on metric
-            if self.metric == 'revenue':
-                analysis = self._analyze_revenue(data)
-            elif self.metric == 'units':
-                analysis = self._analyze_volume(data)
-            elif self.metric == 'aov':
-                analysis = self._analyze_aov(data)
-            else:  # margin
-                analysis = self._analyze_margin(data)
+            # Rank from the fetched rows, so a cache hit needs no further table scan
+            analysis = analyses[self.metric]
+            if self.dimension and self.metric in self.RANKED_METRICS:
+                analysis["top_performers"] = self._rank_dimension_members(
+                    columns, self.metric, analysis[f"total_{self.metric}"]
+                )
             
             # Add visualization if requested
             if self.include_visualization:
-                self._create_trend_visualization(data)
+                self._create_trend_visualization(self._decompose(self._get_period_series(columns)))
             
             return {
                 "status": "success",
@@ -273,264 +679,421 @@ class SalesTrendAnalyzer:
             }
             
         except Exception as e:
-            logger.error(f"Error analyzing trends: {str(e)}")
+            logger.error("Error analyzing trends: %s", e)
             return {
                 "status": "error",
                 "message": str(e)
             }
     
-    def _analyze_revenue(self, data: pd.DataFrame) -> Dict[str, Any]:
+    def analyze_all_metrics(self, start_date: Optional[str] = None,
+                            end_date: Optional[str] = None) -> Dict[str, Any]:
         """
-        Analyze revenue trends.
+        Analyze sales trends for every metric at once.
+        
+        Equivalent to calling analyze_trends with each metric, but the
+        transaction table is scanned once and all metrics are derived from
+        the shared result. The configured metric is ignored and no
+        visualization is created. Margin is omitted when no cost data is available.
         
         Args:
-            data: DataFrame containing sales data
+            start_date: Start date for analysis (YYYY-MM-DD), if None uses earliest available date
+            end_date: End date for analysis (YYYY-MM-DD), if None uses latest available date
             
         Returns:
-            Dictionary containing revenue analysis results
+            Dictionary containing trend analysis results keyed by metric
         """
         try:
-            # Calculate metrics
-            total_revenue = data['revenue'].sum()
-            avg_daily_revenue = data['revenue'].mean()
-            revenue_growth = self._calculate_growth(data['revenue'])
-            
-            # Calculate top performers if dimension is specified
-            top_performers = None
-            if self.dimension and 'dimension_id' in data.columns:
-                # Group by dimension and calculate total revenue
-                dimension_totals = data.groupby(['dimension_id', 'dimension_name'])['revenue'].sum()
-                top_performers = [
-                    {
-                        "id": idx[0],
-                        "name": idx[1],
-                        "value": val,
-                        "share": (val / total_revenue) * 100
-                    }
-                    for idx, val in dimension_totals.nlargest(self.top_n).items()
-                ]
+            trend_data = self._fetch_trend_data(start_date, end_date)
+            if trend_data["status"] == "error":
+                return trend_data
+            
+            start_date = trend_data["start_date"]
+            end_date = trend_data["end_date"]
+            
+            columns = trend_data["columns"]
+            
+            analyses = self._analyze_all(columns)
+            if self.dimension:
+                for metric in self.RANKED_METRICS:
+                    analyses[metric]["top_performers"] = self._rank_dimension_members(
+                        columns, metric, analyses[metric][f"total_{metric}"]
+                    )
             
             return {
                 "status": "success",
-                "total_revenue": total_revenue,
-                "avg_daily_revenue": avg_daily_revenue,
-                "revenue_growth": revenue_growth,
-                "top_performers": top_performers
+                "analysis": analyses,
+                "date_range": {
+                    "start": start_date,
+                    "end": end_date
+                }
             }
             
         except Exception as e:
-            logger.error(f"Error analyzing revenue: {str(e)}")
-            raise
+            logger.error("Error analyzing all metrics: %s", e)
+            return {
+                "status": "error",
+                "message": str(e)
+            }
     
-    def _analyze_volume(self, data: pd.DataFrame) -> Dict[str, Any]:
+    def _fetch_columns(self, conn: sqlite3.Connection, query: str,
+                       params: List[Any]) -> Dict[str, np.ndarray]:
         """
-        Analyze sales volume trends.
+        Execute a query and return its result as typed NumPy columns.
+        
+        Numeric columns are cast using COLUMN_DTYPES, which avoids the dtype
+        inference and index construction of pd.read_sql_query.
         
         Args:
-            data: DataFrame containing sales data
+            conn: Open database connection
+            query: SQL query string
+            params: Query parameters
             
         Returns:
-            Dictionary containing volume analysis results
+            Dictionary mapping column names to arrays, empty if no rows matched
         """
-        try:
-            # Calculate metrics
-            total_units = data['units'].sum()
-            avg_daily_units = data['units'].mean()
-            volume_growth = self._calculate_growth(data['units'])
-            
-            # Calculate top performers if dimension is specified
-            top_performers = None
-            if self.dimension:
-                top_performers = self._get_top_performers(data, 'units')
-            
-            return {
-                "status": "success",
-                "total_units": total_units,
-                "avg_daily_units": avg_daily_units,
-                "volume_growth": volume_growth,
-                "top_performers": top_performers
-            }
-            
-        except Exception as e:
-            logger.error(f"Error analyzing volume: {str(e)}")
-            raise
+        cursor = conn.execute(query, params)
+        names = [description[0] for description in cursor.description]
+        rows = cursor.fetchall()
+        
+        if not rows:
+            return {}
+        
+        table = np.asarray(rows, dtype=object)
+        return {
+            name: table[:, i].astype(self.COLUMN_DTYPES.get(name, object), copy=False)
+            for i, name in enumerate(names)
+        }
     
-    def _analyze_aov(self, data: pd.DataFrame) -> Dict[str, Any]:
+    def _analyze_all(self, columns: Dict[str, np.ndarray]) -> Dict[str, Dict[str, Any]]:
         """
-        Analyze average order value trends.
+        Analyze every metric in a single pass over the trend columns.
         
         Args:
-            data: DataFrame containing sales data
+            columns: Dictionary of NumPy arrays containing sales data
             
         Returns:
-            Dictionary containing AOV analysis results
+            Dictionary mapping each metric to its analysis results. 'margin' is
+            only included when the data provides a 'cost' column
         """
         try:
-            # Calculate AOV
-            data['aov'] = data['revenue'] / data['orders']
-            avg_aov = data['aov'].mean()
-            aov_growth = self._calculate_growth(data['aov'])
+            revenue = columns['revenue']
+            units = columns['units']
+            orders = columns['orders']
             
-            return {
-                "status": "success",
-                "avg_aov": avg_aov,
-                "aov_growth": aov_growth
+            # Derived metrics are computed in place into preallocated buffers; entries
+            # with a zero denominator stay NaN and are skipped by the reductions below
+            aov = np.full_like(revenue, np.nan)
+            np.divide(revenue, orders, out=aov, where=orders != 0)
+            
+            series = [revenue, units, aov]
+            if 'cost' in columns:
+                margin = np.empty_like(revenue)
+                np.subtract(revenue, columns['cost'], out=margin)
+                margin_pct = np.full_like(revenue, np.nan)
+                np.divide(margin, revenue, out=margin_pct, where=revenue != 0)
+                series.append(margin)
+            
+            # Growth only depends on the first and last period of each metric
+            growth = self._calculate_growth_batch(np.stack([values[[0, -1]] for values in series], axis=1))
+            
+            analyses = {
+                'revenue': {
+                    "status": "success",
+                    "total_revenue": np.nansum(revenue),
+                    "avg_daily_revenue": np.nanmean(revenue),
+                    "revenue_growth": float(growth[0]),
+                    "top_performers": None
+                },
+                'units': {
+                    "status": "success",
+                    "total_units": np.nansum(units),
+                    "avg_daily_units": np.nanmean(units),
+                    "volume_growth": float(growth[1]),
+                    "top_performers": None
+                },
+                'aov': {
+                    "status": "success",
+                    "avg_aov": np.nanmean(aov),
+                    "aov_growth": float(growth[2])
+                }
             }
             
+            if 'cost' in columns:
+                analyses['margin'] = {
+                    "status": "success",
+                    "avg_margin": np.nanmean(margin),
+                    "avg_margin_pct": np.nanmean(margin_pct),
+                    "margin_growth": float(growth[3])
+                }
+            
+            return analyses
+            
         except Exception as e:
-            logger.error(f"Error analyzing AOV: {str(e)}")
+            logger.error("Error analyzing metrics: %s", e)
             raise
     
-    def _analyze_margin(self, data: pd.DataFrame) -> Dict[str, Any]:
+    def _calculate_growth_batch(self, values: np.ndarray) -> np.ndarray:
         """
-        Analyze margin trends.
+        Calculate growth rates between first and last period for several metrics at once.
         
         Args:
-            data: DataFrame containing sales data
+            values: 2D array with one column per metric, holding its first period
+                in the first row and its last period in the last row
             
         Returns:
-            Dictionary containing margin analysis results
+            Array of growth rates as percentages, one per column. Columns whose
+            first value is zero yield 0.0, and a single period, being both first
+            and last, shows no growth
         """
-        try:
-            # Calculate margin (assuming we have cost data)
-            data['margin'] = data['revenue'] - data['cost']
-            data['margin_pct'] = data['margin'] / data['revenue']
-            
-            avg_margin = data['margin'].mean()
-            avg_margin_pct = data['margin_pct'].mean()
-            margin_growth = self._calculate_growth(data['margin'])
-            
-            return {
-                "status": "success",
-                "avg_margin": avg_margin,
-                "avg_margin_pct": avg_margin_pct,
-                "margin_growth": margin_growth
-            }
+        growth = np.zeros(values.shape[1], dtype=np.float64)
+        first = values[0]
+        last = values[-1]
+        np.divide(last - first, first, out=growth, where=first != 0)
+        
+        return growth * 100.0
+    
+    def _get_period_series(self, columns: Dict[str, np.ndarray]) -> pd.Series:
+        """
+        Get the configured metric as a single value per period.
+        
+        Args:
+            columns: Dictionary of NumPy arrays containing sales data
             
-        except Exception as e:
-            logger.error(f"Error analyzing margin: {str(e)}")
-            raise
+        Returns:
+            Series of metric values indexed by period
+        """
+        measures = [name for name in ('revenue', 'units', 'orders', 'cost') if name in columns]
+        totals = pd.DataFrame(
+            {name: columns[name] for name in measures}, index=columns['period']
+        ).groupby(level=0, sort=True).sum()
+        
+        if self.metric == 'aov':
+            return totals['revenue'] / totals['orders']
+        if self.metric == 'margin':
+            return totals['revenue'] - totals['cost']
+        return totals[self.metric]
     
-    def _calculate_growth(self, series: pd.Series) -> float:
+    def _rank_dimension_members(self, columns: Dict[str, np.ndarray], metric: str,
+                                total: float) -> List[Dict[str, Any]]:
         """
-        Calculate growth rate between first and last period.
+        Get top performers from trend rows already broken down by dimension.
+        
+        Member totals are summed with np.bincount over factorized dimension ids,
+        so ranking needs no further table scan, even when the rows were cached.
         
         Args:
-            series: Series of values
+            columns: Dictionary of NumPy arrays containing sales data by period and dimension
+            metric: Metric to rank by ('revenue' or 'units')
+            total: Overall metric total used to compute each performer's share
             
         Returns:
-            Growth rate as a percentage
+            List of top performers with their metrics
         """
-        if len(series) < 2:
-            return 0.0
+        # Rows without a dimension member get code -1 and cannot be ranked
+        codes, ids = pd.factorize(columns['dimension_id'])
+        ranked = codes >= 0
+        codes = codes[ranked]
         
-        first_value = series.iloc[0]
-        last_value = series.iloc[-1]
+        # NULL values count as 0, like SQL TOTAL()
+        values = np.nan_to_num(columns[metric][ranked])
+        member_totals = np.bincount(codes, weights=values, minlength=len(ids))
+        names = columns['dimension_name'][ranked]
         
-        if first_value == 0:
-            return 0.0
+        top_performers = []
+        for code in self._top_n_indices(member_totals, self.top_n):
+            # Largest non-NULL name over the member's rows, as MAX() over the whole range would give
+            member_names = [name for name in names[codes == code] if not pd.isna(name)]
+            value = float(member_totals[code])
+            top_performers.append({
+                "id": ids[code],
+                "name": max(member_names, default=None),
+                "value": value,
+                "share": (value / float(total)) * 100 if total else 0.0
+            })
         
-        return ((last_value - first_value) / first_value) * 100
+        return top_performers
     
-    def _get_top_performers(self, data: pd.DataFrame, metric: str) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _top_n_indices(values: np.ndarray, n: int) -> np.ndarray:
         """
-        Get top performers for the specified dimension and metric.
+        Get the indices of the n largest values, largest first.
+        
+        np.argpartition selects the candidates in linear time, so only those
+        n entries are sorted instead of the whole array.
         
         Args:
-            data: DataFrame containing sales data
-            metric: Metric to rank by
+            values: Array of values to rank
+            n: Number of indices to return
             
         Returns:
-            List of top performers with their metrics
+            Array of at most n indices into values
         """
-        if self.dimension == "product":
-            group_col = "Item ID"
-        elif self.dimension == "region":
-            group_col = "Region ID"
-        else:
-            return []
+        if n >= len(values):
+            return np.argsort(-values, kind='stable')
         
-        top_performers = data.groupby(group_col)[metric].sum().nlargest(self.top_n)
+        top = np.argpartition(-values, n)[:n]
+        return top[np.argsort(-values[top], kind='stable')]
+    
+    def _decompose(self, series: pd.Series) -> pd.DataFrame:
+        """
+        Split a metric series into trend, seasonal and residual components.
         
-        return [
-            {
-                "id": idx,
-                "value": val,
-                "share": (val / data[metric].sum()) * 100
-            }
-            for idx, val in top_performers.items()
-        ]
+        A linear fit is removed first to limit wrap-around leakage, then a single
+        real FFT of the remainder is partitioned: frequencies slower than one
+        seasonal cycle are added back to the trend, and the bins at harmonics of
+        the cycle frequency form the seasonal component. A harmonic is only kept
+        if its power stands out from the median periodogram, and no seasonal
+        component is extracted from fewer than two full cycles.
+        
+        Args:
+            series: Series of metric values, one per period
+            
+        Returns:
+            DataFrame with 'sales', 'trend', 'seasonal' and 'residual' columns
+        """
+        values = series.to_numpy(dtype=np.float64)
+        n = len(values)
+        trend = values.copy()
+        seasonal = np.zeros(n)
+        
+        if n >= 3:
+            x = np.arange(n)
+            trend = np.polyval(np.polyfit(x, values, 1), x)
+            
+            cycle = self.SEASONAL_CYCLES[self.time_period]
+            if cycle:
+                spectrum = np.fft.rfft(values - trend)
+                freqs = np.fft.rfftfreq(n)
+                
+                slow = (freqs > 0) & (freqs < 1.0 / cycle)
+                trend += np.fft.irfft(np.where(slow, spectrum, 0), n)
+                
+                if n >= 2 * cycle:
+                    # Bins nearest to the harmonics k / cycle, k = 1..cycle // 2
+                    harmonics = np.rint(np.arange(1, cycle // 2 + 1) * n / cycle).astype(np.int64)
+                    harmonics = np.unique(np.minimum(harmonics, len(spectrum) - 1))
+                    
+                    power = np.abs(spectrum) ** 2
+                    noise_floor = np.median(power[1:])
+                    harmonics = harmonics[power[harmonics] > self.SEASONAL_POWER_RATIO * noise_floor]
+                    
+                    seasonal_spectrum = np.zeros_like(spectrum)
+                    seasonal_spectrum[harmonics] = spectrum[harmonics]
+                    seasonal = np.fft.irfft(seasonal_spectrum, n)
+        
+        return pd.DataFrame({
+            'sales': values,
+            'trend': trend,
+            'seasonal': seasonal,
+            'residual': values - trend - seasonal
+        }, index=series.index)
+    
+    def _get_figure(self) -> Tuple["Figure", np.ndarray]:
+        """
+        Get the figure and 2x2 axes grid reused across visualizations, creating them on first use.
+        
+        matplotlib is only imported here, so analyzers that never plot do not
+        pay for loading it.
+        """
+        if self._figure is None:
+            from matplotlib.figure import Figure
+            
+            self._figure = Figure(figsize=(10, 6))
+            self._axes = self._figure.subplots(2, 2)
+        return self._figure, self._axes
     
     def _create_trend_visualization(self, trend_data: pd.DataFrame) -> None:
         """
         Create a visualization of sales trends.
         
+        The figure is rendered with the Agg canvas directly, without pyplot,
+        and is cleared and redrawn on every call instead of being reallocated.
+        
         Args:
             trend_data: DataFrame containing sales trend data
             
         Returns:
             None (prints Base64 URL instead)
         """
+        if not self.include_visualization:
+            return
+        
         try:
-            plt.figure(figsize=(15, 10))
-            
-            # Plot overall trend
-            plt.subplot(2, 2, 1)
-            plt.plot(trend_data.index, trend_data['sales'], 
-                    label='Sales Trend', color='blue', alpha=0.7)
-            plt.title('Overall Sales Trend')
-            plt.xlabel('Date')
-            plt.ylabel('Sales Amount')
-            plt.grid(True, alpha=0.3)
-            plt.legend()
-            
-            # Plot seasonal patterns
-            plt.subplot(2, 2, 2)
-            plt.plot(trend_data.index, trend_data['seasonal'], 
-                    label='Seasonal Pattern', color='green', alpha=0.7)
-            plt.title('Seasonal Patterns')
-            plt.xlabel('Date')
-            plt.ylabel('Seasonal Component')
-            plt.grid(True, alpha=0.3)
-            plt.legend()
-            
-            # Plot trend component
-            plt.subplot(2, 2, 3)
-            plt.plot(trend_data.index, trend_data['trend'], 
-                    label='Trend Component', color='red', alpha=0.7)
-            plt.title('Trend Component')
-            plt.xlabel('Date')
-            plt.ylabel('Trend Value')
-            plt.grid(True, alpha=0.3)
-            plt.legend()
-            
-            # Plot residuals
-            plt.subplot(2, 2, 4)
-            plt.scatter(trend_data.index, trend_data['residual'], 
-                       label='Residuals', color='purple', alpha=0.5)
-            plt.axhline(y=0, color='black', linestyle='--', alpha=0.3)
-            plt.title('Residuals')
-            plt.xlabel('Date')
-            plt.ylabel('Residual Value')
-            plt.grid(True, alpha=0.3)
-            plt.legend()
-            
-            plt.tight_layout()
-            
-            # Save plot to buffer
-            buffer = io.BytesIO()
-            plt.savefig(buffer, format='png', bbox_inches='tight', dpi=300)
-            buffer.seek(0)
-            
-            # Convert to base64
-            plot_data = base64.b64encode(buffer.read()).decode()
-            
-            # Close plot to free memory
-            plt.close()
+            from matplotlib.ticker import FuncFormatter, MaxNLocator
+            
+            # Integer period keys are plotted by position to avoid gaps between years,
+            # with only a few ticks labelled by their key
+            keys = trend_data.index.to_numpy()
+            periods = np.arange(len(keys))
+            
+            def format_period(position: float, _) -> str:
+                index = int(round(position))
+                return str(keys[index]) if 0 <= index < len(keys) and index == position else ''
+            
+            with self._figure_lock:
+                figure, axes = self._get_figure()
+                for ax in axes.flat:
+                    ax.cla()
+                
+                # Plot overall trend
+                ax = axes[0, 0]
+                ax.plot(periods, trend_data['sales'], 
+                        label='Sales Trend', color='blue', alpha=0.7)
+                ax.set_title('Overall Sales Trend')
+                ax.set_xlabel('Date')
+                ax.set_ylabel('Sales Amount')
+                ax.grid(True, alpha=0.3)
+                ax.legend()
+                
+                # Plot seasonal patterns
+                ax = axes[0, 1]
+                ax.plot(periods, trend_data['seasonal'], 
+                        label='Seasonal Pattern', color='green', alpha=0.7)
+                ax.set_title('Seasonal Patterns')
+                ax.set_xlabel('Date')
+                ax.set_ylabel('Seasonal Component')
+                ax.grid(True, alpha=0.3)
+                ax.legend()
+                
+                # Plot trend component
+                ax = axes[1, 0]
+                ax.plot(periods, trend_data['trend'], 
+                        label='Trend Component', color='red', alpha=0.7)
+                ax.set_title('Trend Component')
+                ax.set_xlabel('Date')
+                ax.set_ylabel('Trend Value')
+                ax.grid(True, alpha=0.3)
+                ax.legend()
+                
+                # Plot residuals
+                ax = axes[1, 1]
+                ax.scatter(periods, trend_data['residual'], 
+                           label='Residuals', color='purple', alpha=0.5)
+                ax.axhline(y=0, color='black', linestyle='--', alpha=0.3)
+                ax.set_title('Residuals')
+                ax.set_xlabel('Date')
+                ax.set_ylabel('Residual Value')
+                ax.grid(True, alpha=0.3)
+                ax.legend()
+                
+                for ax in axes.flat:
+                    ax.xaxis.set_major_locator(MaxNLocator(nbins=6, integer=True))
+                    ax.xaxis.set_major_formatter(FuncFormatter(format_period))
+                
+                figure.tight_layout()
+                
+                # Save plot to buffer; fast zlib level since the PNG is only base64-encoded
+                buffer = io.BytesIO()
+                figure.savefig(buffer, format='png', bbox_inches='tight', dpi=100,
+                               pil_kwargs={'compress_level': 1})
+            
+            # Convert to base64 straight from the buffer's memory, without copying the PNG bytes
+            with buffer.getbuffer() as png:
+                plot_data = base64.b64encode(png).decode('ascii')
             
             # Print the Base64 URL instead of returning it
             print(f"data:image/png;base64,{plot_data}")
             
         except Exception as e:
-            logger.error(f"Error creating trend visualization: {str(e)}")
+            logger.error("Error creating trend visualization: %s", e)
             raise 
\ No newline at end of file